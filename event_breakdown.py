@@ -5,6 +5,7 @@ import argparse
 from typing import Dict, List, Tuple, NamedTuple
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 from collections import defaultdict
 
 
@@ -18,9 +19,10 @@ class BookingSubTotal(NamedTuple):
     ticket_types: List[str]
 
 
-# this is just a typehint
+# these are just typehints
 Bookings = List[List[str]]
 BookingsBreakdown = Dict[str, Dict[str, BookingSubTotal]]
+Tickets = Tuple[Tuple[str, int, float], ...]  # (<ticket name>, <quantity>, <price>)
 
 
 STANDARD_PRICES = {
@@ -29,7 +31,10 @@ STANDARD_PRICES = {
     'Child': 7.0,
 }
 
+ORDINAL_SUFFIX_RE = re.compile(r'([0-9]+)(st|nd|rd|th)')
+
 PREORDERED_TYPES = ['Adult', 'Senior', 'Child']
+PREORDERED_RANK = {ticket_type: rank for rank, ticket_type in enumerate(PREORDERED_TYPES)}
 
 
 def parse_args() -> argparse.Namespace:
@@ -70,7 +75,7 @@ def read_bookings(filename: str) -> Bookings:
     with open(filename, 'r', errors='ignore') as f:  # ignore unicode errors
         data_list = list(csv.reader(f, delimiter=','))  # convert csv data to 2D list
 
-        if data_list == []:
+        if not data_list:
             print("No CSV rows found")
             exit(1)
 
@@ -94,61 +99,38 @@ def calculate_totals(
 
 
 def parse_date(date_str: str) -> datetime:
-    value_clean = re.sub(r'([0-9]+)(st|nd|rd|th)', r'\1', date_str).replace(',', '')
+    value_clean = ORDINAL_SUFFIX_RE.sub(r'\1', date_str).replace(',', '')
     return datetime.strptime(value_clean, '%A %B %d %Y %H:%M %p')
 
 
-def group_by_date(bookings: Bookings, labels: List[str]) -> Dict[str, Bookings]:
-    grouped_bookings = defaultdict(list)
-
-    for booking in bookings:
-        booking_dict = dict(zip(labels, booking))  # map columns to label names
-        full_date = parse_date(booking_dict['Start date'])
-        date = full_date.strftime('%d/%m/%y')
-
-        grouped_bookings[date].append(booking)
-
-    return grouped_bookings
-
+def group_bookings(bookings: Bookings, labels: List[str]) -> Dict[str, Dict[str, Bookings]]:
+    "Group bookings by date and then product name in a single pass"
+    grouped_bookings: Dict[str, Dict[str, Bookings]] = defaultdict(lambda: defaultdict(list))
+    date_keys: Dict[str, str] = {}  # many bookings share a start date, so only parse each one once
 
-def group_by_event(bookings: Bookings, labels: List[str]) -> Dict[str, Bookings]:
-    grouped_bookings = defaultdict(list)
+    # look up the columns once instead of mapping every booking to label names
+    date_column = labels.index('Start date')
+    event_column = labels.index('Product title')
 
     for booking in bookings:
-        booking_dict = dict(zip(labels, booking))  # map columns to label names
-        event = booking_dict['Product title']
-
-        grouped_bookings[event].append(booking)
-
-    return grouped_bookings
-
+        start_date = booking[date_column]
 
-def group_bookings(bookings: Bookings, labels: List[str]) -> Dict[str, Dict[str, Bookings]]:
-    "Group bookings by date and then product name"
-    grouped_bookings: Dict[str, Dict[str, Bookings]] = {}
+        try:
+            date = date_keys[start_date]
+        except KeyError:
+            date = date_keys[start_date] = parse_date(start_date).strftime('%d/%m/%y')
 
-    booking_date_groups = group_by_date(bookings, labels)
-    for date, day_bookings in booking_date_groups.items():
-        grouped_bookings[date] = group_by_event(day_bookings, labels)
+        grouped_bookings[date][booking[event_column]].append(booking)
 
     return grouped_bookings
 
 
 def order_ticket_types(ticket_types: List[str]) -> List[str]:
-    ticket_types_sorted = []
-
-    ticket_types.sort()
-
-    # A hack to manually place the default tickets in the right order
-    for ticket_type in PREORDERED_TYPES:
-        if ticket_type in ticket_types:
-            ticket_types_sorted.append(ticket_type)
-
-    for ticket_type in ticket_types:
-        if ticket_type not in PREORDERED_TYPES:
-            ticket_types_sorted.append(ticket_type)
-
-    return ticket_types_sorted
+    # the default tickets go first in their set order, followed by the rest alphabetically
+    return sorted(
+        ticket_types,
+        key=lambda ticket_type: (PREORDERED_RANK.get(ticket_type, len(PREORDERED_TYPES)), ticket_type),
+    )
 
 
 def subtotal_orders(
@@ -159,18 +141,19 @@ def subtotal_orders(
 ) -> BookingSubTotal:
     full_value_tickets: Dict[str, int] = defaultdict(int)  # all keys map to 0 initially
     reduced_tickets: Dict[str, int] = defaultdict(int)
-    ticket_types = []
     total_value = 0.0
     total_saving = 0.0
     total_extra_cost = 0.0  # the value above a regular service, required for tax calculations
     total_orders = len(bookings)
 
-    for booking in bookings:
-        booking_dict = dict(zip(labels, booking))  # map columns to label names
+    # look up the columns once instead of mapping every booking to label names
+    tickets_column = labels.index('Price categories')
+    price_column = labels.index('Product price')
 
-        tickets = parse_tickets(booking_dict['Price categories'])
+    for booking in bookings:
+        tickets = parse_tickets(booking[tickets_column])
         ticket_regular_rate = calculate_ticket_value(tickets, ticket_values)
-        booking_price = float(booking_dict['Product price'].replace('&pound;', '').replace('£', ''))
+        booking_price = float(booking[price_column].replace('&pound;', '').replace('£', ''))
         saving: float = max(0, ticket_regular_rate - booking_price)  # ignore negative savings
 
         total_value += booking_price
@@ -183,10 +166,8 @@ def subtotal_orders(
             else:
                 reduced_tickets[ticket_name] += ticket_qty
 
-            if ticket_name not in ticket_types:
-                ticket_types.append(ticket_name)
-
-    ticket_types_sorted = order_ticket_types(ticket_types)
+    # every ticket type seen is a key of one of the totals
+    ticket_types_sorted = order_ticket_types(list(full_value_tickets.keys() | reduced_tickets.keys()))
 
     return BookingSubTotal(
         dict(full_value_tickets),
@@ -199,20 +180,21 @@ def subtotal_orders(
     )
 
 
-def parse_tickets(ticket_str: str) -> List[Tuple[str, int, float]]:
+@lru_cache(maxsize=1024)  # many orders have identical price categories
+def parse_tickets(ticket_str: str) -> Tickets:
     ticket_output = []
     tickets = ticket_str.splitlines()  # convert "Price categories" field to a list of tickets
 
     for ticket in tickets:
         # each ticket line is in the format: <ticket name>: <quantity> (£<price>)
-        # every thing before the first ':' in the ticket name
+        # everything before the first ':' is the ticket name
         ticket_name, ticket_field_str = ticket.split(':', maxsplit=1)
         ticket_fields = ticket_field_str.split()  # other fields are space-separated
 
         try:
             ticket_qty = int(ticket_fields[0])
         except IndexError:
-            ticket_price = 0
+            ticket_qty = 0
         try:
             ticket_price = float(ticket_fields[1][2:-1])
         except IndexError:
@@ -220,11 +202,11 @@ def parse_tickets(ticket_str: str) -> List[Tuple[str, int, float]]:
 
         ticket_output.append((ticket_name, ticket_qty, ticket_price))
 
-    return ticket_output
+    return tuple(ticket_output)  # the result is shared between callers so can't be mutable
 
 
 def calculate_ticket_value(
-    tickets: List[Tuple[str, int, float]],
+    tickets: Tickets,
     ticket_values: Dict[str, float],
 ) -> float:
     total_cost = 0.0
@@ -237,7 +219,7 @@ def calculate_ticket_value(
     return total_cost
 
 
-def ticket_extra_cost(tickets: List[Tuple[str, int, float]], standard_prices: Dict[str, float]) -> float:
+def ticket_extra_cost(tickets: Tickets, standard_prices: Dict[str, float]) -> float:
     "Calculate the value above a regular service, required for tax calculations"
     extra_cost = 0.0
 
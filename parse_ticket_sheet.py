@@ -2,9 +2,12 @@
 import re
 import csv
 import sys
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+
+ORDINAL_SUFFIX_RE = re.compile(r'([0-9]+)(st|nd|rd|th)')
 
 
 ## Field conversion functions ##
@@ -16,9 +19,7 @@ def simplify_product(value: str, booking: Dict[str, str]) -> str:
 
 
 def simplify_date(value: str, booking: Dict[str, str]) -> str:
-    value_clean = re.sub(r'([0-9]+)(st|nd|rd|th)', r'\1', value).replace(',', '')
-    date_value = datetime.strptime(value_clean, '%A %B %d %Y %I:%M %p')
-    return date_value.strftime('%a %d/%m')
+    return format_start_date(value, '%a %d/%m')
 
 
 def tidy_price(value: str, booking: Dict[str, str]) -> str:
@@ -32,10 +33,11 @@ def parse_ticket_types(value: str, booking: Dict[str, str]) -> str:
 
     for ticket in tickets:
         # each ticket line starts in the format: <ticket name>: <quantity> (£<price>)
-        ticket_fields = ticket.split()
-        ticket_name = ticket_fields[0][:-1]
-        ticket_qty = int(ticket_fields[1])
-        # ticket_price = float(ticket_fields[2][2:-1])
+        # the name is everything before the first ':' and may contain spaces
+        ticket_name, ticket_field_str = ticket.split(':', maxsplit=1)
+        ticket_fields = ticket_field_str.split()
+        ticket_qty = int(ticket_fields[0])
+        # ticket_price = float(ticket_fields[1][2:-1])
 
         ticket_strings.append(f"{ticket_name[0]}:{ticket_qty}")
 
@@ -43,13 +45,11 @@ def parse_ticket_types(value: str, booking: Dict[str, str]) -> str:
 
 
 def parse_train_time(value: str, booking: Dict[str, str]) -> str:
-    full_date_str = date_sort_item(value)
-    return full_date_str.strftime('%H:%M')
+    return format_start_date(value, '%H:%M')
 
 
 def parse_train_date(value: str, booking: Dict[str, str]) -> str:
-    full_date_str = date_sort_item(value)
-    return full_date_str.strftime('%d/%m')
+    return format_start_date(value, '%d/%m')
 
 
 ## Output configuration ##
@@ -79,6 +79,8 @@ BOOKING_FILTER_STRING = 'Day Rover'  # Only products containing this substring w
 # ===========================
 ## Internal logic ##
 
+MIN_DATE = datetime(1970, 1, 1, 0, 0)  # a date before any booking, used so the first date is printed
+
 
 def parse_args():
     error_string = f'Usage: {sys.argv[0]} <input-csv-file> <output-csv-file>'
@@ -92,13 +94,26 @@ def parse_args():
         exit(1)
 
 
+@lru_cache(maxsize=4096)  # bookings share a small number of train times
 def date_sort_item(date_str: str) -> datetime:
-    value_clean = re.sub(r'([0-9]+)(st|nd|rd|th)', r'\1', date_str).replace(',', '')
+    value_clean = ORDINAL_SUFFIX_RE.sub(r'\1', date_str).replace(',', '')
     return datetime.strptime(value_clean, '%A %B %d %Y %I:%M %p')
 
 
-def sort_bookings(bookings: List[List[str]], input_columns: List[str]) -> List[List[str]]:
-    for sort_column, direction in column_sorts.items():
+@lru_cache(maxsize=4096)  # every booking on a train has the same start date
+def format_start_date(date_str: str, date_format: str) -> str:
+    return date_sort_item(date_str).strftime(date_format)
+
+
+def sort_bookings(
+    bookings: List[List[str]],
+    input_columns: List[str],
+    sorts: Optional[Dict[str, str]] = None,
+) -> List[List[str]]:
+    if sorts is None:
+        sorts = column_sorts
+
+    for sort_column, direction in sorts.items():
         try:
             sort_index = input_columns.index(sort_column)
         except ValueError:
@@ -117,13 +132,19 @@ def sort_bookings(bookings: List[List[str]], input_columns: List[str]) -> List[L
 
 
 def filter_booking(booking: Dict[str, str]) -> bool:
-    return (booking['Product title'].find(BOOKING_FILTER_STRING) != -1)
+    return BOOKING_FILTER_STRING in booking['Product title']
 
 
-def format_booking_row(booking: Dict[str, str]) -> List[str]:
+def format_booking_row(
+    booking: Dict[str, str],
+    configuration: Optional[List[Tuple[Optional[str], str, Optional[Callable]]]] = None,
+) -> List[str]:
+    if configuration is None:
+        configuration = table_configuration
+
     booking_output = []
 
-    for input_column, label, conversion in table_configuration:
+    for input_column, label, conversion in configuration:
         if input_column is None:
             booking_output.append('')
             continue
@@ -138,11 +159,15 @@ def format_booking_row(booking: Dict[str, str]) -> List[str]:
     return booking_output
 
 
+# the ordinal suffix for each day of the month, indexed by day
+DAY_SUFFIXES = tuple(
+    'th' if 10 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+    for day in range(32)
+)
+
+
 def date_suffix(day: int) -> str:
-    if 10 <= day <= 13:
-        return 'th'
-    else:
-        return {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+    return DAY_SUFFIXES[day]
 
 
 def format_group_date(date: datetime) -> str:
@@ -153,8 +178,7 @@ def format_group_date(date: datetime) -> str:
 
 
 def main():
-    output_bookings = []
-    last_seen_date = datetime(1970, 1, 1, 0, 0)  # use minimum date so the first date in printed
+    last_seen_date = MIN_DATE
 
     with open(sys.argv[1], 'r', errors='ignore') as f:
         data_list = list(csv.reader(f, delimiter=','))
@@ -167,23 +191,23 @@ def main():
 
     bookings = sort_bookings(data_list[1:], labels)
 
-    for row in bookings:
-        booking = dict(zip(labels, row))  # map columns to label names
-        if filter_booking(booking):
-            output_bookings.append([format_booking_row(booking), booking])
-
     with open(sys.argv[2], 'w', newline='') as f:  # output data into a new csv
         output = csv.writer(f, quoting=csv.QUOTE_ALL)
 
         output.writerow([column[1] for column in table_configuration])  # write header row
 
-        for booking, original_booking in output_bookings:
+        # write each booking as it is formatted rather than collecting them all first
+        for row in bookings:
+            booking = dict(zip(labels, row))  # map columns to label names
+            if not filter_booking(booking):
+                continue
+
             if GROUP_BOOKINGS_BY_DATE:
-                booking_date = date_sort_item(original_booking['Start date'])
+                booking_date = date_sort_item(booking['Start date'])
                 if booking_date != last_seen_date:
                     output.writerow(['', format_group_date(booking_date)])
                     last_seen_date = booking_date
-            output.writerow(booking)
+            output.writerow(format_booking_row(booking))
 
 
 if __name__ == '__main__':
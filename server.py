@@ -2,12 +2,20 @@
 import csv
 import json
 import requests
-from os import urandom
+from os import fchmod, fstat, fsync, getpid, replace, stat, urandom
 from io import TextIOWrapper
+from types import MappingProxyType
+from uuid import uuid4
+from pathlib import Path
+from cachelib.file import FileSystemCache
 from flask import Flask, Markup, url_for, request, redirect, render_template, session
 from flask_session import Session
-from typing import Dict
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
 from datetime import datetime
+from functools import lru_cache
+from threading import RLock
+from time import time
 from collections import defaultdict
 
 import parse_ticket_sheet
@@ -15,24 +23,45 @@ import event_breakdown
 
 app = Flask(__name__)
 
+SESSION_LIMIT = 500  # the most sessions the session store keeps, also used as the limit of stored CSVs
+
 app.config["SESSION_COOKIE_SECURE"] = True
 app.config["SESSION_USE_SIGNER"] = True
-app.config["SESSION_TYPE"] = "filesystem"
+app.config["SESSION_TYPE"] = "cachelib"
+app.config["SESSION_CACHELIB"] = FileSystemCache('flask_session', threshold=SESSION_LIMIT)
 Session(app)
 
+http_session = requests.Session()  # reuse connections when repeatedly fetching the CSV
+http_session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
 CONFIG_FILE = 'config.json'
+UPLOAD_DIR = 'uploads'
 
 FILTER_STRING = ''
 CSV_URL = ''
 HIDE_OLD_ORDERS = False
 OLD_ORDER_DATE = ''
 TICKET_PRICES: Dict[str, Dict[str, Dict[str, float]]] = {}
+# the (inode, modification time) of the config file when it was last loaded or saved,
+# every save swaps in a new file so the inode changes even if the mtime doesn't
+CONFIG_VERSION = (0, 0)
+CONFIG_REVISION = 0  # incremented whenever the config globals change, for keying caches on them
+CONFIG_LOCK = RLock()  # re-entrant as load_config may save the generated secret key
 
+# these are just typehints
+DayTotals = Dict[str, Dict[str, Any]]
+GrandTotals = Dict[str, Any]
 
-def insert_html_newlines(value: str, booking: Dict[str, str]) -> str:
+
+@lru_cache(maxsize=2048)  # many bookings have identical price categories
+def newlines_to_html(value: str) -> str:
     return Markup(value.replace('\n', '<br>'))
 
 
+def insert_html_newlines(value: str, booking: Dict[str, str]) -> str:
+    return newlines_to_html(value)
+
+
 table_configuration = [
     # (<input column heading>, <output column label>, <optional conversion function>),
     ('Order ID', 'Order', None),
@@ -62,7 +91,10 @@ alpha_table_configuration = [
     ('Special Needs', 'Notes', None),
 ]
 
-column_align = {
+HEADER_TABLE = tuple(column[1] for column in table_configuration)
+HEADER_ALPHA = tuple(column[1] for column in alpha_table_configuration)
+
+column_align = MappingProxyType({
     'Order': 'center',
     'Booking': 'center',
     'First name': 'right',
@@ -76,39 +108,152 @@ column_align = {
     'Train': 'center',
     'Date': 'center',
     'Notes': 'center',
-}
+})
+
+# the alignment of each column, in header order
+ALIGN_TABLE = tuple(column_align[label] for label in HEADER_TABLE)
+ALIGN_ALPHA = tuple(column_align[label] for label in HEADER_ALPHA)
+
+
+class ViewLayout(NamedTuple):
+    table_configuration: List[Tuple[Any, str, Any]]
+    column_sorts: Dict[str, str]
+    group_by_date: bool
+
+
+# how each view lays out the bookings, passed explicitly so the views never share module state
+VIEWS = MappingProxyType({
+    'tickets': ViewLayout(
+        table_configuration,
+        parse_ticket_sheet.column_sorts,
+        parse_ticket_sheet.GROUP_BOOKINGS_BY_DATE,
+    ),
+    'alpha': ViewLayout(
+        alpha_table_configuration,
+        {'Customer first name': 'ASC', 'Customer last name': 'ASC'},
+        False,
+    ),
+})
+
+
+def parse_bookings(
+    raw_data,
+    layout: ViewLayout,
+    filter_string: str,
+    hide_old_orders: bool,
+    old_order_date: str,
+):
+    labels = raw_data[0]  # top row is labels
+    rows = raw_data[1:]
+
+    # filter the raw rows first so only the bookings that are shown get sorted and mapped
+    if hide_old_orders:  # filter bookings by date
+        earliest_order_date = datetime.strptime(old_order_date, '%Y-%m-%d')
+        date_column = labels.index('Start date')
+        rows = [
+            row for row in rows
+            if parse_ticket_sheet.date_sort_item(row[date_column]) >= earliest_order_date
+        ]
+
+    if filter_string:  # an empty filter matches every booking
+        # the same test as filter_booking, without building a dict for rows that are dropped
+        title_column = labels.index('Product title')
+        rows = [row for row in rows if filter_string in row[title_column]]
+
+    # the sorts are stable, so sorting the kept rows gives the same order as filtering sorted rows
+    rows = parse_ticket_sheet.sort_bookings(rows, labels, layout.column_sorts)
+    bookings = [dict(zip(labels, row)) for row in rows]  # map columns to label names
+
+    return [
+        [parse_ticket_sheet.format_booking_row(booking, layout.table_configuration), booking]
+        for booking in bookings
+    ]
+
+
+@lru_cache(maxsize=16)
+def parse_stored_bookings(
+    csv_path: str,
+    view: str,
+    filter_string: str,
+    hide_old_orders: bool,
+    old_order_date: str,
+):
+    """
+    Everything the result depends on is in the arguments, so it is reused until the
+    CSV or the filters change. It is shared between requests and must not be modified.
+    """
+    return parse_bookings(
+        read_csv_file(csv_path),
+        VIEWS[view],
+        filter_string,
+        hide_old_orders,
+        old_order_date,
+    )
 
 
-def parse_bookings(raw_data):
-    parsed_bookings = []
-    earliest_order_date = datetime.strptime(OLD_ORDER_DATE, '%Y-%m-%d')
-    labels = raw_data[0]  # top row is labels
+def load_bookings(view: str):
+    "Parse and filter the session's CSV for the given view"
+    return parse_stored_bookings(
+        session['csv_path'],
+        view,
+        FILTER_STRING,
+        HIDE_OLD_ORDERS,
+        OLD_ORDER_DATE,
+    )
 
-    bookings = parse_ticket_sheet.sort_bookings(raw_data[1:], labels)
 
-    for row in bookings:
-        booking = dict(zip(labels, row))  # map columns to label names
+@lru_cache(maxsize=8)
+def compute_stored_breakdown(
+    csv_path: str,
+    filter_string: str,
+    hide_old_orders: bool,
+    old_order_date: str,
+    config_revision: int,
+) -> Tuple[event_breakdown.BookingsBreakdown, DayTotals, GrandTotals]:
+    """
+    Built from the tickets view's bookings, which depend only on the arguments.
+    The ticket prices are part of the config, so its revision stands in for them.
+    The result is shared between requests and must not be modified.
+    """
+    parsed_bookings = parse_stored_bookings(
+        csv_path, 'tickets', filter_string, hide_old_orders, old_order_date,
+    )
+    filtered_bookings = [list(booking[1].values()) for booking in parsed_bookings]
 
-        if HIDE_OLD_ORDERS:  # filter bookings by date
-            if parse_ticket_sheet.date_sort_item(booking['Start date']) < earliest_order_date:
-                continue
+    try:
+        labels = list(parsed_bookings[0][1].keys())
+    except IndexError:
+        # no bookings in parsed_bookings
+        breakdown = {}
+    else:
+        breakdown = prepare_ticket_breakdown(filtered_bookings, labels)
 
-        if parse_ticket_sheet.filter_booking(booking):
-            parsed_bookings.append([parse_ticket_sheet.format_booking_row(booking), booking])
+    daily_totals, totals = compute_totals(breakdown)
 
-    return parsed_bookings
+    return breakdown, daily_totals, totals
 
 
-def prepare_booking_table_values(processed_bookings, header, day_totals=None):
+def load_breakdown() -> Tuple[event_breakdown.BookingsBreakdown, DayTotals, GrandTotals]:
+    "Calculate the ticket breakdown and totals of the session's CSV, shared by /tickets and /breakdown"
+    return compute_stored_breakdown(
+        session['csv_path'],
+        FILTER_STRING,
+        HIDE_OLD_ORDERS,
+        OLD_ORDER_DATE,
+        CONFIG_REVISION,
+    )
+
+
+def prepare_booking_table_values(processed_bookings, group_by_date, day_totals=None):
     rendered_bookings = []
-    last_seen_date = datetime(1970, 1, 1, 0, 0)  # use minimum date so the first date in printed
+    last_seen_date = parse_ticket_sheet.MIN_DATE
 
     for booking, original_booking in processed_bookings:
-        if parse_ticket_sheet.GROUP_BOOKINGS_BY_DATE:
+        if group_by_date:
             booking_date = parse_ticket_sheet.date_sort_item(original_booking['Start date'])
             if booking_date.date() != last_seen_date.date():
                 if (
-                    last_seen_date != datetime(1970, 1, 1, 0, 0)
+                    last_seen_date != parse_ticket_sheet.MIN_DATE
                     and day_totals is not None
                 ):
                     try:
@@ -126,7 +271,7 @@ def prepare_booking_table_values(processed_bookings, header, day_totals=None):
 
         rendered_bookings.append({
             'booking_type': 'order',
-            'booking': dict(zip(header, booking)),
+            'booking': booking,  # values are in the same order as the header
         })
 
     if day_totals is not None:
@@ -162,8 +307,11 @@ def prepare_ticket_breakdown(processed_bookings, labels):
     return dict(totals)
 
 
-def generate_day_totals(breakdown):
+def compute_totals(breakdown) -> Tuple[DayTotals, GrandTotals]:
+    "Calculate the daily totals and grand totals in a single pass over the breakdown"
     daily_totals = {}
+    totals = {'total_value': 0, 'total_orders': 0, 'total_tickets': 0}
+    total_types = defaultdict(int)
 
     for date, date_group in breakdown.items():
         num_tickets = 0
@@ -172,16 +320,17 @@ def generate_day_totals(breakdown):
         ticket_totals = defaultdict(int)
 
         for _, event_totals in date_group.items():
-            num_tickets += sum(event_totals.full_value_tickets.values())
-            num_tickets += sum(event_totals.reduced_tickets.values())
             num_orders += event_totals.total_orders
             total_cost += event_totals.total_value
 
+            # count the tickets while merging them rather than summing each dict separately
             for ticket, qty in event_totals.full_value_tickets.items():
                 ticket_totals[ticket] += qty
+                num_tickets += qty
 
             for ticket, qty in event_totals.reduced_tickets.items():
                 ticket_totals[ticket] += qty
+                num_tickets += qty
 
         ticket_types = event_breakdown.order_ticket_types(list(ticket_totals.keys()))
 
@@ -197,28 +346,83 @@ def generate_day_totals(breakdown):
             'ticket_totals': ticket_totals_sorted,
         }
 
-    return daily_totals
-
-
-def grand_total_orders(breakdown):
-    totals = {'total_value': 0, 'total_orders': 0, 'total_tickets': 0}
-    total_types = defaultdict(int)
-
-    for date, day_bookings in breakdown.items():
-        for event, event_bookings in day_bookings.items():
-            totals['total_value'] += event_bookings.total_value
-            totals['total_orders'] += event_bookings.total_orders
-            totals['total_tickets'] += sum(event_bookings.full_value_tickets.values())
-            totals['total_tickets'] += sum(event_bookings.reduced_tickets.values())
-            for ticket, qty in event_bookings.full_value_tickets.items():
-                total_types[ticket] += qty
-            for ticket, qty in event_bookings.reduced_tickets.items():
-                total_types[ticket] += qty
+        totals['total_value'] += total_cost
+        totals['total_orders'] += num_orders
+        totals['total_tickets'] += num_tickets
+        for ticket, qty in ticket_totals.items():
+            total_types[ticket] += qty
 
     total_types['Child'] += total_types['Family Child']
     del total_types['Family Child']
     totals['total_types'] = dict(total_types)
-    return totals
+
+    return daily_totals, totals
+
+
+def store_csv(csv_chunks: Iterable[str]) -> None:
+    """
+    Write the CSV to disk and keep only its path in the session,
+    so the full CSV isn't pickled into the session on every request
+    """
+    Path(UPLOAD_DIR).mkdir(exist_ok=True)
+    csv_path = Path(UPLOAD_DIR) / f"{uuid4().hex}.csv"
+
+    try:
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in csv_chunks:
+                f.write(chunk)
+    except BaseException:
+        csv_path.unlink(missing_ok=True)
+        raise
+
+    old_path = session.get('csv_path')
+    if old_path is not None:
+        Path(old_path).unlink(missing_ok=True)
+
+    session['csv_path'] = str(csv_path)
+    session.pop('csv_data', None)  # sessions from before CSVs were stored on disk hold the whole CSV
+
+    prune_uploads()
+
+
+def prune_uploads() -> None:
+    """
+    Remove stored CSVs by age and count, without checking which sessions still use them.
+    CSVs uploaded longer ago than the session lifetime are removed, and only the
+    newest SESSION_LIMIT are kept, so a long-lived or busy session can lose its CSV.
+    """
+    expiry = time() - app.permanent_session_lifetime.total_seconds()
+    uploads = []
+
+    for csv_path in Path(UPLOAD_DIR).glob('*.csv'):
+        try:
+            uploads.append((csv_path.stat().st_mtime, csv_path))
+        except FileNotFoundError:
+            continue  # removed by another worker
+
+    uploads.sort(reverse=True)  # newest first
+
+    for index, (modified, csv_path) in enumerate(uploads):
+        if index >= SESSION_LIMIT or modified < expiry:
+            csv_path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=8)
+def read_csv_file(csv_path: str) -> List[List[str]]:
+    """
+    Stored CSVs are never modified, so they only need parsing once per worker.
+    The returned rows are shared between requests and must not be modified.
+    """
+    with open(csv_path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        return list(csv.reader(f, delimiter=','))
+
+
+def load_csv() -> List[List[str]]:
+    "Read the CSV stored for this session, raises KeyError if there isn't one"
+    try:
+        return read_csv_file(session['csv_path'])
+    except FileNotFoundError:
+        raise KeyError('csv_path')
 
 
 def render_tickets_error(error, err_str=None):
@@ -241,23 +445,30 @@ def load_fresh_config():
 @app.route('/auto')
 def ticket_sheet():
     try:
-        r = requests.get(CSV_URL, timeout=10)
+        r = http_session.get(CSV_URL, timeout=10, stream=True)
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
         return render_tickets_error("Failed to fetch CSV data", err_str=e)
 
     except requests.exceptions.RequestException as e:
         return render_tickets_error("An error occured while fetching CSV data", err_str=e)
 
-    if r.status_code != 200:
-        return render_tickets_error("Failed to fetch CSV data", err_str=f"Error code: {r.status_code}")
+    with r:  # return the connection to the pool once the body is read
+        if r.status_code != 200:
+            return render_tickets_error("Failed to fetch CSV data", err_str=f"Error code: {r.status_code}")
+
+        if r.headers['Content-Type'].find('text/csv') == -1:
+            return render_tickets_error("Retrieved data was not a CSV", err_str="Check the CSV URL.")
 
-    if r.headers['Content-Type'].find('text/csv') == -1:
-        return render_tickets_error("Retrieved data was not a CSV", err_str="Check the CSV URL.")
+        if r.encoding is None:
+            r.encoding = 'utf-8'
 
-    data_list = list(csv.reader(r.text.splitlines(keepends=True), delimiter=','))
+        try:
+            # stream the body straight to disk rather than building r.text in memory
+            store_csv(r.iter_content(chunk_size=65536, decode_unicode=True))
+        except requests.exceptions.RequestException as e:
+            return render_tickets_error("An error occured while fetching CSV data", err_str=e)
 
     session['csv_name'] = f"Auto ({datetime.now().strftime('%c')})"
-    session['csv_data'] = data_list
     return redirect(url_for('ticket_table'))
 
 
@@ -289,7 +500,7 @@ def uploaded_tickets():
             )
 
         session['csv_name'] = f.filename
-        session['csv_data'] = data_list
+        store_csv([csv_str])
         session['csv_uploaded'] = datetime.now().strftime('%d-%b %H:%M')
         return redirect(url_for('ticket_table'))
     except KeyError:
@@ -331,38 +542,26 @@ def update_config():
 @app.route('/tickets')
 def ticket_table():
     try:
-        orders = session['csv_data']
+        orders = load_csv()
     except KeyError:
         return render_tickets_error("Please upload a CSV")
 
     if not orders:
         return render_tickets_error("No Ticket Data Found")
 
-    # Setup column layout & filter
-    parse_ticket_sheet.table_configuration = table_configuration
-    parse_ticket_sheet.BOOKING_FILTER_STRING = FILTER_STRING
+    header = HEADER_TABLE
 
-    header = [column[1] for column in parse_ticket_sheet.table_configuration]
-
-    parsed_bookings = parse_bookings(orders)
-    filtered_bookings = [booking[1].values() for booking in parsed_bookings]
-
-    try:
-        labels = parsed_bookings[0][1].keys()
-    except IndexError:
-        # no bookings in parsed_bookings
-        breakdown = {}
-    else:
-        breakdown = prepare_ticket_breakdown(filtered_bookings, labels)
-
-    daily_totals = generate_day_totals(breakdown)
-    rendered_bookings = prepare_booking_table_values(parsed_bookings, header, daily_totals)
+    parsed_bookings = load_bookings('tickets')
+    _, daily_totals, _ = load_breakdown()
+    rendered_bookings = prepare_booking_table_values(
+        parsed_bookings, VIEWS['tickets'].group_by_date, daily_totals,
+    )
 
     return render_template(
         'ticket_table.html',
         header=header,
         bookings=rendered_bookings,
-        align=column_align,
+        align=ALIGN_TABLE,
         columns=len(header),
         config={
             'csv_url': CSV_URL,
@@ -379,37 +578,23 @@ def ticket_table():
 @app.route('/alpha')
 def alphabetical_orders():
     try:
-        orders = session['csv_data']
+        orders = load_csv()
     except KeyError:
         return render_tickets_error("Please upload a CSV")
 
     if not orders:
         return render_tickets_error("No Ticket Data Found")
 
-    old_group_bookings = parse_ticket_sheet.GROUP_BOOKINGS_BY_DATE
-    old_sort_order = parse_ticket_sheet.column_sorts
-
-    try:
-        # Setup column layout & filter
-        parse_ticket_sheet.table_configuration = alpha_table_configuration
-        parse_ticket_sheet.BOOKING_FILTER_STRING = FILTER_STRING
-
-        parse_ticket_sheet.GROUP_BOOKINGS_BY_DATE = False
-        parse_ticket_sheet.column_sorts = {'Customer first name': 'ASC', 'Customer last name': 'ASC'}
-
-        header = [column[1] for column in parse_ticket_sheet.table_configuration]
+    header = HEADER_ALPHA
 
-        parsed_bookings = parse_bookings(orders)
-        rendered_bookings = prepare_booking_table_values(parsed_bookings, header)
-    finally:
-        parse_ticket_sheet.GROUP_BOOKINGS_BY_DATE = old_group_bookings
-        parse_ticket_sheet.column_sorts = old_sort_order
+    parsed_bookings = load_bookings('alpha')
+    rendered_bookings = prepare_booking_table_values(parsed_bookings, VIEWS['alpha'].group_by_date)
 
     return render_template(
         'ticket_table.html',
         header=header,
         bookings=rendered_bookings,
-        align=column_align,
+        align=ALIGN_ALPHA,
         columns=len(header),
         config={
             'csv_url': CSV_URL,
@@ -427,27 +612,14 @@ def alphabetical_orders():
 @app.route('/breakdown')
 def ticket_breakdown():
     try:
-        orders = session['csv_data']
+        orders = load_csv()
     except KeyError:
         return render_tickets_error("Please upload a CSV")
 
     if not orders:
         return render_tickets_error("No Ticket Data Found")
 
-    # Setup column layout & filter
-    parse_ticket_sheet.table_configuration = table_configuration
-    parse_ticket_sheet.BOOKING_FILTER_STRING = FILTER_STRING
-
-    parsed_bookings = parse_bookings(orders)
-    filtered_bookings = [booking[1].values() for booking in parsed_bookings]
-
-    try:
-        labels = parsed_bookings[0][1].keys()
-    except IndexError:
-        # no bookings in parsed_bookings
-        breakdown = {}
-    else:
-        breakdown = prepare_ticket_breakdown(filtered_bookings, labels)
+    breakdown, _, totals = load_breakdown()
 
     return render_template(
         'ticket_breakdown.html',
@@ -459,7 +631,7 @@ def ticket_breakdown():
         csv_name=session.get('csv_name'),
         csv_uploaded=session.get('csv_uploaded'),
         breakdown=breakdown,
-        totals=grand_total_orders(breakdown),
+        totals=totals,
         active='breakdown'
     )
 
@@ -489,6 +661,8 @@ def set_event_price():
 
 
 def save_config():
+    global CONFIG_VERSION, CONFIG_REVISION
+
     config = {
         "product filter": FILTER_STRING,
         "CSV URL": CSV_URL,
@@ -501,29 +675,71 @@ def save_config():
     config['secret_key'] = app.secret_key
     config['ticket prices'] = TICKET_PRICES
 
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=4)
+    # encode up front so the file is written in one call rather than per JSON token
+    config_str = json.dumps(config, indent=4)
+
+    with CONFIG_LOCK:
+        # write to a temporary file and swap it in, so other workers never read a partial config
+        temp_file = f"{CONFIG_FILE}.{getpid()}.tmp"
+        try:
+            config_mode = stat(CONFIG_FILE).st_mode & 0o777
+        except FileNotFoundError:
+            config_mode = None
+
+        try:
+            with open(temp_file, 'w') as f:
+                if config_mode is not None:
+                    # keep the existing permissions, the config holds the secret key
+                    fchmod(f.fileno(), config_mode)
+                f.write(config_str)
+                f.flush()
+                fsync(f.fileno())  # make sure the new config is on disk before it replaces the old one
+                # the rename keeps this inode and mtime, taking them from the config file
+                # could pick up another worker's save
+                temp_stat = fstat(f.fileno())
+                config_version = (temp_stat.st_ino, temp_stat.st_mtime_ns)
+            replace(temp_file, CONFIG_FILE)
+        except BaseException:
+            Path(temp_file).unlink(missing_ok=True)
+            raise
+
+        # the globals already match what was written, so don't reload it
+        CONFIG_VERSION = config_version
+        CONFIG_REVISION += 1
 
 
 def load_config():
     global FILTER_STRING, CSV_URL, HIDE_OLD_ORDERS, OLD_ORDER_DATE, TICKET_PRICES
+    global CONFIG_VERSION, CONFIG_REVISION
+
+    config_stat = stat(CONFIG_FILE)
+    config_version = (config_stat.st_ino, config_stat.st_mtime_ns)
+    if config_version == CONFIG_VERSION:
+        return  # unchanged since it was last loaded or saved
+
+    with CONFIG_LOCK:
+        if config_version == CONFIG_VERSION:
+            return  # another thread loaded it while we waited for the lock
+
+        with open(CONFIG_FILE, 'r') as f:
+            config_data = json.load(f)
 
-    with open(CONFIG_FILE, 'r') as f:
-        config_data = json.load(f)
+        CONFIG_VERSION = config_version
+        CONFIG_REVISION += 1
 
-    FILTER_STRING = config_data['product filter']
-    CSV_URL = config_data['CSV URL']
-    HIDE_OLD_ORDERS = config_data['hide old orders']
-    OLD_ORDER_DATE = config_data['old order date']
-    TICKET_PRICES = config_data.get('ticket prices', {})
+        FILTER_STRING = config_data['product filter']
+        CSV_URL = config_data['CSV URL']
+        HIDE_OLD_ORDERS = config_data['hide old orders']
+        OLD_ORDER_DATE = config_data['old order date']
+        TICKET_PRICES = config_data.get('ticket prices', {})
 
-    if app.secret_key is None:
-        if config_data.get('secret_key') is None:
-            app.secret_key = urandom(24).hex()
-        else:
-            app.secret_key = config_data['secret_key']
+        if app.secret_key is None:
+            if config_data.get('secret_key') is None:
+                app.secret_key = urandom(24).hex()
+            else:
+                app.secret_key = config_data['secret_key']
 
-        save_config()
+            save_config()
 
 
 load_config()